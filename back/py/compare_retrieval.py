@@ -0,0 +1,224 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from tabulate import tabulate
+
+from train import MaterialsQAModel
+
+logger = logging.getLogger(__name__)
+
+
+def train_in_memory(base_path: str, retrieval_mode: str, lsa_components: int,
+                    held_out: Set[str] = frozenset(),
+                    lsa_threshold: Optional[float] = None) -> MaterialsQAModel:
+    """Обучение модели на файлах load_all_data без сохранения в pkl.
+
+    Вопросы из held_out исключаются из обучающей выборки.
+    """
+    model = MaterialsQAModel()
+    model.retrieval_mode = retrieval_mode
+    model.lsa_components = lsa_components
+    if lsa_threshold is not None:
+        model.lsa_threshold = lsa_threshold
+    model.load_data_files(base_path)
+
+    if held_out:
+        model.questions = [q for q in model.questions if q not in held_out]
+        for question in held_out:
+            model.answers.pop(question, None)
+            model.data_sources.pop(question, None)
+
+    model.vectorize_questions()
+    model.is_trained = model.question_vectors is not None
+    return model
+
+
+def answer_key(answer: str) -> str:
+    """Нормализация ответа так же, как в evaluate_answer"""
+    return re.sub(r'\s+', '', answer.lower())
+
+
+def paraphrase_folds(model: MaterialsQAModel) -> List[List[Tuple[str, str]]]:
+    """Разбиение перефразировок на фолды для оценки leave-one-out.
+
+    Перефразировками считаются разные вопросы с одинаковым ответом.
+    В фолде i из каждой группы отложен i-й вопрос, остальные вопросы
+    группы остаются в индексе, поэтому правильный ответ всегда найдется
+    только через другую формулировку.
+    """
+    groups = defaultdict(list)
+    for question in dict.fromkeys(model.questions):
+        groups[answer_key(model.answers[question])].append(question)
+    groups = [sorted(group) for group in groups.values() if len(group) > 1]
+
+    num_folds = max((len(group) for group in groups), default=0)
+    folds = []
+    for i in range(num_folds):
+        fold = [(group[i], model.answers[group[i]]) for group in groups if i < len(group)]
+        folds.append(fold)
+    return folds
+
+
+def measure_recall(model: MaterialsQAModel, pairs: List[Tuple[str, str]], top_k: int) -> Dict:
+    """Попадания в первые k найденных и ответы generate_answer на паре вопросов.
+
+    answered - число вопросов, где близость лучшего найденного выше
+    порога answer_threshold, correct - сколько из них ответы верны.
+    """
+    hits = {k: 0 for k in range(1, top_k + 1)}
+    answered = 0
+    correct = 0
+    threshold = model.answer_threshold()
+    results = model.find_similar_questions_batch([q for q, _ in pairs], top_k=top_k)
+    for (_, correct_answer), similar in zip(pairs, results):
+        for rank, item in enumerate(similar, 1):
+            if model.evaluate_answer(item['answer'], correct_answer):
+                for k in range(rank, top_k + 1):
+                    hits[k] += 1
+                break
+        if similar and similar[0]['similarity'] > threshold:
+            answered += 1
+            correct += int(model.evaluate_answer(similar[0]['answer'], correct_answer))
+    return {'hits': hits, 'answered': answered, 'correct': correct}
+
+
+def held_out_recall(base_path: str, retrieval_mode: str, lsa_components: int,
+                    folds: List[List[Tuple[str, str]]], top_k: int,
+                    lsa_threshold: Optional[float] = None) -> Dict:
+    """Полнота recall@k, доля ответов и точность на отложенных перефразировках"""
+    hits = {k: 0 for k in range(1, top_k + 1)}
+    answered = 0
+    correct = 0
+    total = 0
+    for fold in folds:
+        model = train_in_memory(base_path, retrieval_mode, lsa_components, {q for q, _ in fold},
+                                lsa_threshold)
+        fold_stats = measure_recall(model, fold, top_k)
+        for k in hits:
+            hits[k] += fold_stats['hits'][k]
+        answered += fold_stats['answered']
+        correct += fold_stats['correct']
+        total += len(fold)
+    return {
+        'recall': {k: hits[k] / total if total else 0.0 for k in hits},
+        'answered': answered / total if total else 0.0,
+        'precision': correct / answered if answered else 0.0
+    }
+
+
+def answered_rate(model: MaterialsQAModel, questions: List[str]) -> float:
+    """Доля вопросов, на которые generate_answer дает ответ выше порога"""
+    if not questions:
+        return 0.0
+    threshold = model.answer_threshold()
+    results = model.find_similar_questions_batch(questions, top_k=1)
+    return sum(1 for similar in results if similar and similar[0]['similarity'] > threshold) / len(questions)
+
+
+def measure_latency(model: MaterialsQAModel, questions: List[str], batch_size: int) -> Dict[str, float]:
+    """Задержка одиночного запроса и пропускная способность пакетного поиска"""
+    latencies = []
+    for question in questions:
+        started = time.perf_counter()
+        model.find_similar_questions(question, top_k=1)
+        latencies.append(time.perf_counter() - started)
+    latencies = np.array(latencies) * 1000
+
+    started = time.perf_counter()
+    for i in range(0, len(questions), batch_size):
+        model.find_similar_questions_batch(questions[i:i + batch_size], top_k=1)
+    batch_elapsed = time.perf_counter() - started
+
+    return {
+        'p50': float(np.percentile(latencies, 50)),
+        'p95': float(np.percentile(latencies, 95)),
+        'mean': float(latencies.mean()),
+        'batch_qps': len(questions) / batch_elapsed if batch_elapsed > 0 else 0.0
+    }
+
+
+def index_size(model: MaterialsQAModel) -> int:
+    """Размер индекса поиска в байтах"""
+    if model.retrieval_mode == 'lsa' and model.dense_vectors is not None:
+        return model.dense_vectors.nbytes + model.svd.components_.nbytes
+    vectors = model.question_vectors
+    return vectors.data.nbytes + vectors.indices.nbytes + vectors.indptr.nbytes
+
+
+def load_unseen_questions(base_path: str, model: MaterialsQAModel) -> List[str]:
+    """Вопросы infoblocks2, которых нет в обучающей выборке"""
+    file_paths = sorted(glob.glob(os.path.join(base_path, "datasource/infoblocks2", "*.json")))
+    questions = []
+    for file_path in file_paths:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        questions.extend(item['q'] for item in data if 'q' in item and item['q'] not in model.answers)
+    return questions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Сравнение поиска TF-IDF и LSA")
+    parser.add_argument('--base-path', default='gost/back/py', help="директория с datasource")
+    parser.add_argument('--components', type=int, default=300, help="размерность LSA")
+    parser.add_argument('--top-k', type=int, default=5, help="максимальный k для recall@k")
+    parser.add_argument('--batch-size', type=int, default=64, help="размер пакета запросов")
+    parser.add_argument('--lsa-threshold', type=float, default=None,
+                        help="порог уверенности LSA (по умолчанию как в модели)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logger.info("Запуск сравнения режимов поиска")
+    # Отладочное логирование модели на каждый запрос искажает задержку
+    logging.getLogger('train').setLevel(logging.ERROR)
+
+    reference = train_in_memory(args.base_path, 'sparse', args.components)
+    if not reference.is_trained:
+        print("Ошибка: модель не обучена")
+        sys.exit(1)
+    folds = paraphrase_folds(reference)
+    questions = list(dict.fromkeys(reference.questions))
+    unseen = load_unseen_questions(args.base_path, reference)
+    print(f"Отложенных перефразировок: {sum(len(fold) for fold in folds)}, фолдов: {len(folds)}, "
+          f"вопросов infoblocks2 вне обучения: {len(unseen)}")
+
+    rows = []
+    for mode in ('sparse', 'lsa'):
+        model = train_in_memory(args.base_path, mode, args.components, lsa_threshold=args.lsa_threshold)
+        held_out = held_out_recall(args.base_path, mode, args.components, folds, args.top_k,
+                                   args.lsa_threshold)
+        recall = held_out['recall']
+        latency = measure_latency(model, questions, args.batch_size)
+        dense = mode == 'lsa' and model.dense_vectors is not None
+        dimension = model.dense_vectors.shape[1] if dense else model.question_vectors.shape[1]
+
+        rows.append([
+            mode,
+            dimension,
+            f"{index_size(model) / 1024:.0f}",
+            f"{recall[1]:.2%}",
+            f"{recall[args.top_k]:.2%}",
+            f"{model.answer_threshold():.2f}",
+            f"{held_out['answered']:.2%}",
+            f"{held_out['precision']:.2%}",
+            f"{answered_rate(model, unseen):.2%}",
+            f"{latency['p50']:.3f}",
+            f"{latency['p95']:.3f}",
+            f"{latency['batch_qps']:.0f}"
+        ])
+
+    headers = ['Режим', 'Размерность', 'Индекс, КБ', 'recall@1', f"recall@{args.top_k}",
+               'Порог', 'Ответов', 'Точность', 'Ответов infoblocks2',
+               'p50, мс', 'p95, мс', 'Пакет, запр/с']
+    print("\n=== Сравнение режимов поиска ===")
+    print(tabulate(rows, headers=headers, tablefmt='grid'))
@@ -1,6 +1,8 @@
 import json
 from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.decomposition import TruncatedSVD
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 import numpy as np
 import logging
 import sys
@@ -36,6 +38,17 @@ class MaterialsQAModel:
         self.failed_questions = []
         self.is_trained = False
 
+        self.retrieval_mode = 'sparse' # поиск по разреженным TF-IDF векторам
+        #self.retrieval_mode = 'lsa' # поиск в плотном пространстве TruncatedSVD (LSA)
+        self.lsa_components = 300
+        # Порог уверенности ответа. Косинусная близость в пространстве LSA
+        # выше, чем у TF-IDF, поэтому порог для LSA подобран отдельно по
+        # compare_retrieval.py (доля ответов и точность на перефразировках)
+        self.similarity_threshold = 0.5
+        self.lsa_threshold = 0.6
+        self.svd = None
+        self.dense_vectors = None
+
         self.model_path = 'trained_model.pkl'
         #self.model_path = 'trained_model_promt_template.pkl'
 
@@ -54,7 +67,10 @@ class MaterialsQAModel:
                 'answers': self.answers,
                 'question_vectors': self.question_vectors,
                 'data_sources': self.data_sources,
-                'is_trained': self.is_trained
+                'is_trained': self.is_trained,
+                'retrieval_mode': self.retrieval_mode,
+                'svd': self.svd,
+                'dense_vectors': self.dense_vectors
             }
 
             with open(self.model_path, 'wb') as f:
@@ -83,6 +99,17 @@ class MaterialsQAModel:
             self.question_vectors = model_data['question_vectors']
             self.data_sources = model_data['data_sources']
             self.is_trained = model_data['is_trained']
+            # Модели, сохраненные до появления режима LSA, остаются разреженными
+            stored_mode = model_data.get('retrieval_mode', 'sparse')
+            self.svd = model_data.get('svd')
+            self.dense_vectors = model_data.get('dense_vectors')
+
+            if stored_mode != self.retrieval_mode:
+                logger.warning(f"Модель {self.model_path} обучена в режиме '{stored_mode}', "
+                               f"а задан режим '{self.retrieval_mode}'. Для сохранения "
+                               f"нового режима удалите файл модели и переобучите ее")
+            if self.retrieval_mode == 'lsa' and self.dense_vectors is None and self.question_vectors is not None:
+                self.build_dense_index()
 
             logger.info(f"Модель успешно загружена из {self.model_path}")
             return True
@@ -100,7 +127,23 @@ class MaterialsQAModel:
 
         logger.info("Начало загрузки данных из всех файлов")
 
-        # Пути к файлам
+        file_count = self.load_data_files(base_path)
+
+        logger.info(f"Обработано файлов: {file_count}")
+        logger.info(f"Загружено вопросов: {len(self.questions)}")
+
+        if self.questions:
+            self.vectorize_questions()
+            self.is_trained = True
+            # Сохраняем обученную модель
+            self.save_model()
+        else:
+            logger.error("Не загружено ни одного вопроса")
+            print("Ошибка: не удалось загрузить вопросы")
+
+    @staticmethod
+    def get_data_files(base_path: str) -> List[Tuple[str, str]]:
+        """Файлы обучающей выборки и их тип источника"""
         table_files = [
             os.path.join(base_path, "datasource/tables", f"89-table{i}.json")
             for i in range(1, 7)
@@ -109,27 +152,19 @@ class MaterialsQAModel:
             os.path.join(base_path, "datasource/infoblocks", f"89-{i}.json")
             for i in range(1, 7)
         ]
+        return [(file_path, "table") for file_path in table_files] + \
+               [(file_path, "infoblock") for file_path in infoblock_files]
 
+    def load_data_files(self, base_path: str) -> int:
+        """Загрузка вопросов из файлов обучающей выборки без векторизации"""
         file_count = 0
-        for file_path in table_files + infoblock_files:
+        for file_path, source_type in self.get_data_files(base_path):
             if os.path.exists(file_path):
-                source_type = "table" if "table" in file_path else "infoblock"
                 self.load_file(file_path, source_type)
                 file_count += 1
             else:
                 logger.warning(f"Файл не найден: {file_path}")
-
-        logger.info(f"Обработано файлов: {file_count}")
-        logger.info(f"Загружено вопросов: {len(self.questions)}")
-
-        if self.questions:
-            self.vectorize_questions()
-            self.is_trained = True
-            # Сохраняем обученную модель
-            self.save_model()
-        else:
-            logger.error("Не загружено ни одного вопроса")
-            print("Ошибка: не удалось загрузить вопросы")
+        return file_count
 
     def load_file(self, file_path: str, source_type: str):
         """Загрузка данных из одного файла"""
@@ -170,36 +205,89 @@ class MaterialsQAModel:
         except Exception as e:
             logger.error(f"Ошибка векторизации: {str(e)}")
             self.question_vectors = None
+            return
+
+        if self.retrieval_mode == 'lsa':
+            self.build_dense_index()
+
+    def build_dense_index(self):
+        """Проекция TF-IDF матрицы в плотное пространство LSA"""
+        n_samples, n_features = self.question_vectors.shape
+        n_components = min(self.lsa_components, n_samples - 1, n_features - 1)
+        self.svd = None
+        self.dense_vectors = None
+
+        # При ошибке LSA модель остается рабочей в разреженном режиме
+        if n_components < 1:
+            logger.warning(f"Недостаточно данных для LSA ({n_samples} вопросов, {n_features} терминов), "
+                           f"используется разреженный поиск")
+            return
+
+        try:
+            logger.info(f"Построение LSA индекса: {n_components} компонент")
+            svd = TruncatedSVD(n_components=n_components, random_state=42)
+            dense = svd.fit_transform(self.question_vectors)
+            # Нормированные строки float32 в непрерывной памяти: косинусная
+            # близость сводится к одному матричному произведению (BLAS sgemm)
+            self.dense_vectors = np.ascontiguousarray(normalize(dense).astype(np.float32))
+            self.svd = svd
+            logger.info(f"LSA индекс построен. Размер: {self.dense_vectors.shape}, "
+                        f"объясненная дисперсия: {self.svd.explained_variance_ratio_.sum():.2%}")
+        except Exception as e:
+            logger.error(f"Ошибка построения LSA индекса, используется разреженный поиск: {str(e)}")
+            self.dense_vectors = None
+
+    def compute_similarities(self, questions: List[str]) -> np.ndarray:
+        """Матрица близости пакета вопросов ко всем вопросам модели"""
+        question_vectors = self.vectorizer.transform(questions)
+        if self.retrieval_mode == 'lsa' and self.dense_vectors is not None:
+            query = normalize(self.svd.transform(question_vectors)).astype(np.float32)
+            return query @ self.dense_vectors.T
+        return cosine_similarity(question_vectors, self.question_vectors)
 
     def find_similar_questions(self, question: str, top_k: int = 5) -> List[Dict]:
         """Поиск наиболее похожих вопросов"""
+        results = self.find_similar_questions_batch([question], top_k)
+        return results[0] if results else []
+
+    def find_similar_questions_batch(self, questions: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """Пакетный поиск наиболее похожих вопросов"""
         if not self.is_trained or self.question_vectors is None:
             logger.error("Модель не обучена или векторы не инициализированы")
             return []
 
         try:
-            question_vector = self.vectorizer.transform([question])
-            similarities = cosine_similarity(question_vector, self.question_vectors).flatten()
-            top_indices = similarities.argsort()[-top_k:][::-1]
-
-            similar_questions = []
-            for idx in top_indices:
-                q = self.questions[idx]
-                source = self.data_sources.get(q, "Неизвестный источник")
-                if source != "Неизвестный источник":
-                    similar_questions.append({
-                        'similarity': float(similarities[idx]),
-                        'question': q,
-                        'answer': self.answers[q],
-                        'source': source
-                    })
-
-            return similar_questions
+            similarities_matrix = self.compute_similarities(questions)
+
+            batch_results = []
+            for similarities in similarities_matrix:
+                top_indices = similarities.argsort()[-top_k:][::-1]
+
+                similar_questions = []
+                for idx in top_indices:
+                    q = self.questions[idx]
+                    source = self.data_sources.get(q, "Неизвестный источник")
+                    if source != "Неизвестный источник":
+                        similar_questions.append({
+                            'similarity': float(similarities[idx]),
+                            'question': q,
+                            'answer': self.answers[q],
+                            'source': source
+                        })
+                batch_results.append(similar_questions)
+
+            return batch_results
 
         except Exception as e:
             logger.error(f"Ошибка при поиске похожих вопросов: {str(e)}")
             return []
 
+    def answer_threshold(self) -> float:
+        """Порог уверенности для текущего режима поиска"""
+        if self.retrieval_mode == 'lsa' and self.dense_vectors is not None:
+            return self.lsa_threshold
+        return self.similarity_threshold
+
     def generate_answer(self, question: str) -> Tuple[str, float, str]:
         """Генерация ответа на основе похожих вопросов"""
         if not self.is_trained:
@@ -209,7 +297,7 @@ class MaterialsQAModel:
 
         if similar_questions:
             most_similar = similar_questions[0]
-            if most_similar['similarity'] > 0.5:
+            if most_similar['similarity'] > self.answer_threshold():
                 return most_similar['answer'], most_similar['similarity'], most_similar['source']
 
             logger.warning(f"Низкая уверенность ({most_similar['similarity']:.2f}) для вопроса: {question}")
@@ -0,0 +1,173 @@
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import sys
+import unicodedata
+from datetime import datetime
+from typing import Dict, List
+
+from train import MaterialsQAModel
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT = 'gost-search-index'
+INDEX_VERSION = 2
+# Переносимая запись правила токенизации TfidfVectorizer по умолчанию
+# (?u)\b\w\w+\b: регулярное выражение ECMAScript/Dart с флагом unicode
+TOKEN_PATTERN = r'[\p{L}\p{N}_]{2,}'
+TOKEN_PATTERN_FLAGS = 'u'
+SKLEARN_TOKEN_PATTERN = r'(?u)\b\w\w+\b'
+
+
+def is_token_char(char: str) -> bool:
+    """Символ из класса [\\p{L}\\p{N}_]"""
+    return char == '_' or unicodedata.category(char)[0] in ('L', 'N')
+
+
+def tokenize(text: str, lowercase: bool = True) -> List[str]:
+    """Эталонная реализация правила токенизации, экспортируемого клиенту"""
+    if lowercase:
+        text = text.lower()
+    tokens = []
+    current = []
+    for char in text + ' ':
+        if is_token_char(char):
+            current.append(char)
+            continue
+        if len(current) >= 2:
+            tokens.append(''.join(current))
+        current = []
+    return tokens
+
+
+def check_vectorizer(vectorizer):
+    """Проверка, что настройки векторизатора выражаются правилом TOKEN_PATTERN"""
+    if (vectorizer.analyzer != 'word' or vectorizer.ngram_range != (1, 1)
+            or vectorizer.token_pattern != SKLEARN_TOKEN_PATTERN
+            or vectorizer.tokenizer is not None or vectorizer.preprocessor is not None
+            or vectorizer.stop_words is not None or vectorizer.strip_accents is not None
+            or vectorizer.norm != 'l2' or not vectorizer.use_idf or vectorizer.binary):
+        raise ValueError("Экспорт поддерживает только токенизацию TfidfVectorizer по умолчанию")
+
+
+def build_index(model: MaterialsQAModel, with_questions: bool = False) -> Dict:
+    """Сборка компактного индекса поиска из обученной модели.
+
+    Индекс повторяет разреженный режим поиска модели. Для каждого
+    термина словаря хранится список документов разностями номеров,
+    документ повторяется столько раз, сколько термин в нем встречается
+    (разность 0). Веса TF-IDF не хранятся: idf и нормы документов клиент
+    вычисляет по постингам теми же формулами, что TfidfVectorizer.
+    Ответы и источники дедуплицируются, тексты вопросов включаются
+    только по with_questions.
+    """
+    vectorizer = model.vectorizer
+    check_vectorizer(vectorizer)
+    if model.retrieval_mode != 'sparse':
+        logger.warning(f"Модель работает в режиме '{model.retrieval_mode}', а индекс клиента "
+                       f"повторяет разреженный поиск TF-IDF: ранжирование может отличаться")
+
+    vocabulary = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    analyzer = vectorizer.build_analyzer()
+    postings = [[] for _ in vocabulary]
+    previous = [0] * len(vocabulary)
+    for doc_id, question in enumerate(model.questions):
+        for token in analyzer(question):
+            term_id = vectorizer.vocabulary_.get(token)
+            if term_id is None:
+                continue
+            postings[term_id].append(doc_id - previous[term_id])
+            previous[term_id] = doc_id
+
+    answers, answer_index = [], {}
+    sources, source_index = [], {}
+    answer_ids, source_ids = [], []
+    for question in model.questions:
+        answer = model.answers[question]
+        if answer not in answer_index:
+            answer_index[answer] = len(answers)
+            answers.append(answer)
+        source = model.data_sources.get(question, "Неизвестный источник")
+        if source not in source_index:
+            source_index[source] = len(sources)
+            sources.append(source)
+        answer_ids.append(answer_index[answer])
+        source_ids.append(source_index[source])
+
+    index = {
+        'format': INDEX_FORMAT,
+        'version': INDEX_VERSION,
+        'tokenizer': {
+            'lowercase': vectorizer.lowercase,
+            'token_pattern': TOKEN_PATTERN,
+            'flags': TOKEN_PATTERN_FLAGS
+        },
+        'scoring': {
+            'retrieval_mode': 'sparse',
+            'server_retrieval_mode': model.retrieval_mode,
+            'norm': vectorizer.norm,
+            'smooth_idf': vectorizer.smooth_idf,
+            'sublinear_tf': vectorizer.sublinear_tf
+        },
+        'vocabulary': vocabulary,
+        'postings': postings,
+        'answer_ids': answer_ids,
+        'source_ids': source_ids,
+        'answers': answers,
+        'sources': sources
+    }
+    if with_questions:
+        index['questions'] = list(model.questions)
+
+    # Контрольная сумма по содержимому без даты сборки: одинаковые данные
+    # дают одинаковую сумму, клиент может по ней пропускать перезагрузку
+    payload = json.dumps(index, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    index['checksum'] = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    index['built_at'] = datetime.now().isoformat(timespec='seconds')
+    return index
+
+
+def save_index(index: Dict, output_path: str, compress: bool = False):
+    """Запись индекса в компактный json (при compress - в gzip)"""
+    payload = json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if compress:
+        payload = gzip.compress(payload, mtime=0)
+    with open(output_path, 'wb') as f:
+        f.write(payload)
+    return len(payload)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Экспорт индекса поиска для клиента promptchat")
+    parser.add_argument('--base-path', default='gost/back/py', help="директория с datasource")
+    parser.add_argument('--model-path', default=None, help="pkl модель (по умолчанию как в train.py)")
+    parser.add_argument('--output', default='search_index.json', help="файл индекса")
+    parser.add_argument('--with-questions', action='store_true',
+                        help="включить тексты вопросов (нужны для подсказок в клиенте)")
+    parser.add_argument('--gzip', action='store_true', help="сжать индекс gzip")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logger.info("Запуск экспорта индекса поиска")
+
+    model = MaterialsQAModel()
+    if args.model_path:
+        model.model_path = args.model_path
+    model.load_all_data(args.base_path)
+
+    if not model.is_trained:
+        logger.error("Модель не обучена")
+        print("Ошибка: модель не обучена")
+        sys.exit(1)
+
+    index = build_index(model, args.with_questions)
+    size = save_index(index, args.output, args.gzip)
+
+    logger.info(f"Индекс сохранен в {args.output}: терминов {len(index['vocabulary'])}, "
+                f"вопросов {len(index['answer_ids'])}, ответов {len(index['answers'])}")
+    print(f"Индекс сохранен в {args.output} ({size} байт, версия {INDEX_VERSION}, "
+          f"checksum {index['checksum'][:12]})")
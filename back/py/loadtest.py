@@ -0,0 +1,364 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+from tabulate import tabulate
+
+from train import MaterialsQAModel
+
+logger = logging.getLogger(__name__)
+
+# Границы уверенности такие же, как в copilot.py: low < confidence <= high
+CONFIDENCE_BUCKETS = [
+    ('<50%', float('-inf'), 0.5),
+    ('50-80%', 0.5, 0.8),
+    ('>80%', 0.8, float('inf')),
+]
+
+
+def load_questions_from_files(file_paths: List[str]) -> List[str]:
+    """Загрузка полей 'q' из json файлов datasource"""
+    questions = []
+    for file_path in file_paths:
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            questions.extend(item['q'] for item in data if 'q' in item)
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке файла {file_path}: {str(e)}")
+    return questions
+
+
+def load_query_log(log_path: str) -> List[str]:
+    """Загрузка записанного журнала запросов.
+
+    Поддерживается текст (один вопрос на строку) и JSONL с полем
+    'q' или 'question'.
+    """
+    questions = []
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    logger.error(f"Ошибка в строке {line_number} журнала {log_path}: {str(e)}")
+                    continue
+                question = record.get('q') or record.get('question')
+                if question:
+                    questions.append(question)
+            else:
+                questions.append(line)
+    return questions
+
+
+def load_workload(base_path: str, source: str, log_path: Optional[str] = None) -> List[str]:
+    """Формирование набора вопросов для нагрузки"""
+    if source == 'datasource':
+        # Те же файлы, на которых обучается модель
+        file_paths = [file_path for file_path, _ in MaterialsQAModel.get_data_files(base_path)
+                      if os.path.exists(file_path)]
+        return load_questions_from_files(file_paths)
+    if source == 'infoblocks2':
+        file_paths = sorted(glob.glob(os.path.join(base_path, "datasource/infoblocks2", "*.json")))
+        return load_questions_from_files(file_paths)
+    if source == 'log':
+        if not log_path:
+            raise ValueError("Для источника 'log' необходимо указать --log-file")
+        return load_query_log(log_path)
+    raise ValueError(f"Неизвестный источник нагрузки: {source}")
+
+
+def build_schedule(questions: List[str], num_requests: int, rate: float, seed: int) -> List[Dict]:
+    """Построение воспроизводимого плана запросов.
+
+    При rate > 0 моменты поступления берутся из пуассоновского потока
+    (открытый цикл), иначе запросы отправляются сразу по освобождении
+    исполнителя (закрытый цикл) и время поступления равно None.
+    """
+    rng = random.Random(seed)
+    schedule = []
+    arrival = 0.0
+    for i in range(num_requests):
+        if rate > 0:
+            arrival += rng.expovariate(rate)
+        schedule.append({
+            'id': i,
+            'question': rng.choice(questions),
+            'arrival': arrival if rate > 0 else None
+        })
+    return schedule
+
+
+class InProcessTarget:
+    """Вызов MaterialsQAModel в текущем процессе"""
+
+    def __init__(self, model: MaterialsQAModel):
+        self.model = model
+
+    def ask(self, question: str):
+        answer, confidence, source = self.model.generate_answer(question)
+        if source == "Ошибка":
+            raise RuntimeError(answer)
+        return answer, confidence, source
+
+
+class HttpTarget:
+    """Вызов локального HTTP endpoint.
+
+    Ожидается POST с телом {"question": ...} и ответ
+    {"answer": ..., "confidence": ..., "source": ...}.
+    """
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        self.url = url
+        self.timeout = timeout
+
+    def ask(self, question: str):
+        body = json.dumps({'question': question}, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(
+            self.url, data=body, headers={'Content-Type': 'application/json; charset=utf-8'}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = json.loads(response.read().decode('utf-8'))
+        return data['answer'], float(data.get('confidence', 0.0)), data.get('source', '')
+
+
+def run_load(target, schedule: List[Dict], concurrency: int, rate: float) -> Dict:
+    """Прогон плана запросов с заданной конкурентностью"""
+    results = []
+    results_lock = threading.Lock()
+    start = time.perf_counter()
+
+    def execute(item: Dict):
+        issued = time.perf_counter() - start
+        error = None
+        confidence = 0.0
+        try:
+            _, confidence, _ = target.ask(item['question'])
+        except Exception as e:
+            error = str(e)
+        finished = time.perf_counter() - start
+        # В открытом цикле задержка считается от планового поступления,
+        # поэтому время ожидания в очереди входит в результат
+        arrival = item['arrival'] if item['arrival'] is not None else issued
+        record = {
+            'id': item['id'],
+            'arrival': arrival,
+            'finished': finished,
+            'latency': finished - arrival,
+            'service': finished - issued,
+            'confidence': float(confidence),
+            'error': error
+        }
+        with results_lock:
+            results.append(record)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        if rate > 0:
+            for item in schedule:
+                delay = item['arrival'] - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(execute, item)
+        else:
+            queue = iter(schedule)
+            queue_lock = threading.Lock()
+
+            def worker():
+                while True:
+                    with queue_lock:
+                        item = next(queue, None)
+                    if item is None:
+                        return
+                    execute(item)
+
+            for _ in range(concurrency):
+                executor.submit(worker)
+
+    elapsed = time.perf_counter() - start
+    results.sort(key=lambda r: r['id'])
+    return {'results': results, 'elapsed': elapsed}
+
+
+def confidence_distribution(records: List[Dict]) -> Dict[str, int]:
+    """Распределение уверенности по корзинам"""
+    distribution = {name: 0 for name, _, _ in CONFIDENCE_BUCKETS}
+    for record in records:
+        if record['error'] is not None:
+            continue
+        for name, low, high in CONFIDENCE_BUCKETS:
+            if low < record['confidence'] <= high:
+                distribution[name] += 1
+                break
+    return distribution
+
+
+def latency_stats(records: List[Dict]) -> Dict[str, float]:
+    """Перцентили задержки в миллисекундах"""
+    if not records:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    latencies = np.array([r['latency'] for r in records]) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'max': float(latencies.max())}
+
+
+def summarize(run: Dict, window: float) -> Dict:
+    """Сводная статистика прогона и разбивка по временным окнам"""
+    results = run['results']
+    elapsed = run['elapsed']
+    errors = sum(1 for r in results if r['error'] is not None)
+
+    summary = {
+        'requests': len(results),
+        'elapsed': elapsed,
+        'throughput': len(results) / elapsed if elapsed > 0 else 0.0,
+        'error_rate': errors / len(results) if results else 0.0,
+        'latency_ms': latency_stats(results),
+        'confidence': confidence_distribution(results),
+    }
+
+    windows = []
+    if results and window > 0:
+        num_windows = int(max(r['finished'] for r in results) // window) + 1
+        for i in range(num_windows):
+            window_start = i * window
+            records = [r for r in results if window_start <= r['finished'] < window_start + window]
+            window_errors = sum(1 for r in records if r['error'] is not None)
+            # Последнее окно обычно неполное
+            duration = min(window, elapsed - window_start)
+            windows.append({
+                'start': window_start,
+                'requests': len(records),
+                'throughput': len(records) / duration if duration > 0 else 0.0,
+                'error_rate': window_errors / len(records) if records else 0.0,
+                'latency_ms': latency_stats(records),
+                'confidence': confidence_distribution(records),
+            })
+    summary['windows'] = windows
+    return summary
+
+
+def window_label(start: float, window: float) -> str:
+    """Подпись временного окна с точностью, достаточной для его ширины"""
+    decimals = 0
+    while decimals < 6 and abs(round(window, decimals) - window) > 1e-9:
+        decimals += 1
+    return f"{start:.{decimals}f}-{start + window:.{decimals}f}"
+
+
+def print_report(summary: Dict, window: float):
+    """Вывод результатов нагрузочного теста в табличном виде"""
+    latency = summary['latency_ms']
+    print("\n=== Результаты нагрузочного теста ===")
+    total_table = [
+        ['Всего запросов', summary['requests']],
+        ['Длительность, с', f"{summary['elapsed']:.2f}"],
+        ['Пропускная способность, запр/с', f"{summary['throughput']:.2f}"],
+        ['Доля ошибок', f"{summary['error_rate']:.2%}"],
+        ['p50, мс', f"{latency['p50']:.2f}"],
+        ['p95, мс', f"{latency['p95']:.2f}"],
+        ['p99, мс', f"{latency['p99']:.2f}"],
+        ['max, мс', f"{latency['max']:.2f}"],
+    ]
+    for name, count in summary['confidence'].items():
+        total_table.append([f"Уверенность {name}", count])
+    print(tabulate(total_table, tablefmt='grid'))
+
+    if summary['windows']:
+        print("\n=== Динамика по времени ===")
+        headers = ['Окно, с', 'Запросов', 'Запр/с', 'Ошибки', 'p50, мс', 'p95, мс', 'p99, мс', 'max, мс']
+        headers += [f"Увер. {name}" for name, _, _ in CONFIDENCE_BUCKETS]
+        window_table = []
+        for w in summary['windows']:
+            lat = w['latency_ms']
+            window_table.append([
+                window_label(w['start'], window),
+                w['requests'],
+                f"{w['throughput']:.2f}",
+                f"{w['error_rate']:.1%}",
+                f"{lat['p50']:.2f}",
+                f"{lat['p95']:.2f}",
+                f"{lat['p99']:.2f}",
+                f"{lat['max']:.2f}",
+            ] + [w['confidence'][name] for name, _, _ in CONFIDENCE_BUCKETS])
+        print(tabulate(window_table, headers=headers, tablefmt='grid'))
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест ответов MaterialsQAModel")
+    parser.add_argument('--base-path', default='gost/back/py', help="директория с datasource")
+    parser.add_argument('--model-path', default=None, help="pkl модель (по умолчанию как в train.py)")
+    parser.add_argument('--source', choices=['datasource', 'infoblocks2', 'log'], default='datasource',
+                        help="источник вопросов")
+    parser.add_argument('--log-file', default=None, help="журнал запросов для --source log")
+    parser.add_argument('--url', default=None, help="локальный endpoint вместо вызова в процессе")
+    parser.add_argument('--concurrency', type=int, default=4, help="число параллельных исполнителей")
+    parser.add_argument('--rate', type=float, default=0.0,
+                        help="интенсивность открытого цикла, запр/с (0 - закрытый цикл)")
+    parser.add_argument('--requests', type=int, default=1000, help="число запросов")
+    parser.add_argument('--seed', type=int, default=42, help="seed для воспроизводимости")
+    parser.add_argument('--window', type=float, default=1.0, help="ширина временного окна, с")
+    parser.add_argument('--output', default=None, help="сохранить отчет в json")
+    args = parser.parse_args(argv)
+
+    if args.concurrency < 1:
+        parser.error("--concurrency должно быть не меньше 1")
+    if args.requests < 1:
+        parser.error("--requests должно быть не меньше 1")
+    if args.window <= 0:
+        parser.error("--window должно быть больше 0")
+    if args.rate < 0:
+        parser.error("--rate не может быть отрицательным")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logger.info("Запуск нагрузочного теста")
+
+    questions = load_workload(args.base_path, args.source, args.log_file)
+    if not questions:
+        print("Ошибка: не удалось загрузить вопросы для нагрузки")
+        sys.exit(1)
+    logger.info(f"Загружено вопросов для нагрузки: {len(questions)}")
+
+    if args.url:
+        target = HttpTarget(args.url)
+    else:
+        model = MaterialsQAModel()
+        if args.model_path:
+            model.model_path = args.model_path
+        model.load_all_data(args.base_path)
+        if not model.is_trained:
+            logger.error("Модель не обучена")
+            print("Ошибка: модель не обучена")
+            sys.exit(1)
+        target = InProcessTarget(model)
+
+    # Отладочное логирование модели на каждый запрос искажает задержку
+    logging.getLogger('train').setLevel(logging.ERROR)
+
+    schedule = build_schedule(questions, args.requests, args.rate, args.seed)
+    run = run_load(target, schedule, args.concurrency, args.rate)
+    summary = summarize(run, args.window)
+    print_report(summary, args.window)
+
+    if args.output:
+        report = {'config': vars(args), 'summary': summary}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info(f"Отчет сохранен в {args.output}")
@@ -0,0 +1,121 @@
+import logging
+import math
+import os
+from collections import Counter, defaultdict
+from typing import Dict, Optional
+
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from export_index import build_index, tokenize
+from train import MaterialsQAModel
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def train_in_memory(retrieval_mode: str = 'sparse') -> MaterialsQAModel:
+    """Модель, обученная в памяти на файлах load_all_data"""
+    model = MaterialsQAModel()
+    model.retrieval_mode = retrieval_mode
+    model.load_data_files(BASE_PATH)
+    model.vectorize_questions()
+    model.is_trained = True
+    return model
+
+
+def term_weight(count: int, idf: float, sublinear_tf: bool) -> float:
+    tf = 1 + math.log(count) if sublinear_tf else count
+    return tf * idf
+
+
+def load_reference_index(index: Dict) -> Dict:
+    """Эталон клиента, шаг загрузки: развертывание постингов, idf и нормы документов"""
+    scoring = index['scoring']
+    num_docs = len(index['answer_ids'])
+
+    doc_counts = []
+    idf = []
+    for entry in index['postings']:
+        counts = Counter()
+        doc_id = 0
+        for gap in entry:
+            doc_id += gap
+            counts[doc_id] += 1
+        doc_counts.append(counts)
+        df = len(counts)
+        if scoring['smooth_idf']:
+            idf.append(math.log((1 + num_docs) / (1 + df)) + 1)
+        else:
+            idf.append(math.log(num_docs / df) + 1)
+
+    doc_norms = [0.0] * num_docs
+    for term_id, counts in enumerate(doc_counts):
+        for doc_id, count in counts.items():
+            doc_norms[doc_id] += term_weight(count, idf[term_id], scoring['sublinear_tf']) ** 2
+
+    return {
+        'lowercase': index['tokenizer']['lowercase'],
+        'sublinear_tf': scoring['sublinear_tf'],
+        'vocabulary': {term: term_id for term_id, term in enumerate(index['vocabulary'])},
+        'doc_counts': doc_counts,
+        'idf': idf,
+        'doc_norms': [math.sqrt(norm) for norm in doc_norms]
+    }
+
+
+def reference_search(loaded: Dict, question: str) -> Optional[int]:
+    """Эталон клиента, шаг запроса: лучший документ для вопроса"""
+    vocabulary = loaded['vocabulary']
+    query = Counter(vocabulary[t] for t in tokenize(question, loaded['lowercase']) if t in vocabulary)
+    if not query:
+        return None
+
+    weights = {t: term_weight(count, loaded['idf'][t], loaded['sublinear_tf']) for t, count in query.items()}
+    query_norm = math.sqrt(sum(w * w for w in weights.values()))
+
+    scores = defaultdict(float)
+    for term_id, weight in weights.items():
+        for doc_id, count in loaded['doc_counts'][term_id].items():
+            doc_weight = term_weight(count, loaded['idf'][term_id], loaded['sublinear_tf'])
+            scores[doc_id] += weight / query_norm * doc_weight / loaded['doc_norms'][doc_id]
+    return max(scores, key=scores.get)
+
+
+@pytest.fixture(scope='module')
+def model():
+    return train_in_memory()
+
+
+def test_tokenize_matches_vectorizer_analyzer(model):
+    analyzer = model.vectorizer.build_analyzer()
+    for question in model.questions:
+        assert tokenize(question) == analyzer(question), question
+
+
+def test_tokenize_follows_lowercase_flag(model):
+    analyzer = TfidfVectorizer(lowercase=False).build_analyzer()
+    for question in model.questions:
+        assert tokenize(question, lowercase=False) == analyzer(question), question
+
+
+def test_search_matches_model_similarity(model):
+    index = build_index(model)
+    loaded = load_reference_index(index)
+    for question in dict.fromkeys(model.questions):
+        similarities = model.compute_similarities([question])[0]
+        doc_id = reference_search(loaded, question)
+        if doc_id is None:
+            # Вопрос без известных терминов, модель тоже ничего не находит
+            assert similarities.max() == 0, question
+            continue
+        # При равных весах допустим любой из лучших документов
+        assert similarities[doc_id] >= similarities.max() - 1e-9, question
+
+
+def test_lsa_model_export_is_marked(caplog):
+    model = train_in_memory('lsa')
+    with caplog.at_level(logging.WARNING, logger='export_index'):
+        index = build_index(model)
+    assert index['scoring']['retrieval_mode'] == 'sparse'
+    assert index['scoring']['server_retrieval_mode'] == 'lsa'
+    assert any("ранжирование может отличаться" in record.message for record in caplog.records)
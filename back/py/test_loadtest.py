@@ -0,0 +1,62 @@
+import pytest
+
+from loadtest import (build_schedule, confidence_distribution, load_query_log, parse_args,
+                      summarize, window_label)
+
+QUESTIONS = ['вопрос 1', 'вопрос 2', 'вопрос 3']
+
+
+def make_record(record_id: int, finished: float, confidence: float = 0.9, error: str = None):
+    return {'id': record_id, 'arrival': finished, 'finished': finished, 'latency': 0.01,
+            'service': 0.01, 'confidence': confidence, 'error': error}
+
+
+def test_schedule_is_reproducible():
+    assert build_schedule(QUESTIONS, 50, 20.0, seed=7) == build_schedule(QUESTIONS, 50, 20.0, seed=7)
+    assert build_schedule(QUESTIONS, 50, 0.0, seed=7) == build_schedule(QUESTIONS, 50, 0.0, seed=7)
+    assert build_schedule(QUESTIONS, 50, 20.0, seed=7) != build_schedule(QUESTIONS, 50, 20.0, seed=8)
+
+
+def test_open_loop_arrivals_increase():
+    arrivals = [item['arrival'] for item in build_schedule(QUESTIONS, 200, 50.0, seed=1)]
+    assert all(later > earlier for earlier, later in zip(arrivals, arrivals[1:]))
+
+
+def test_closed_loop_has_no_arrivals():
+    assert all(item['arrival'] is None for item in build_schedule(QUESTIONS, 10, 0.0, seed=1))
+
+
+def test_summarize_windows_and_partial_throughput():
+    # 4 запроса в первой секунде, 1 - в неполной второй (прогон длится 1.5 с)
+    results = [make_record(i, t) for i, t in enumerate([0.1, 0.2, 0.5, 0.9, 1.2])]
+    summary = summarize({'results': results, 'elapsed': 1.5}, window=1.0)
+
+    assert [w['requests'] for w in summary['windows']] == [4, 1]
+    assert summary['windows'][0]['throughput'] == pytest.approx(4.0)
+    assert summary['windows'][1]['throughput'] == pytest.approx(2.0)
+    assert summary['throughput'] == pytest.approx(5 / 1.5)
+
+
+def test_confidence_buckets_match_copilot():
+    records = [make_record(0, 0.0, 0.5), make_record(1, 0.0, 0.8), make_record(2, 0.0, 0.81),
+               make_record(3, 0.0, 0.0), make_record(4, 0.0, 0.9, error='timeout')]
+    assert confidence_distribution(records) == {'<50%': 2, '50-80%': 1, '>80%': 1}
+
+
+def test_window_labels_are_distinct():
+    labels = [window_label(i * 0.05, 0.05) for i in range(5)]
+    assert len(set(labels)) == len(labels)
+    assert labels[1] == '0.05-0.10'
+
+
+def test_query_log_skips_malformed_lines(tmp_path):
+    log_path = tmp_path / 'queries.jsonl'
+    log_path.write_text('{"q": "первый"}\n{bad\nвторой\n{"question": "третий"}\n', encoding='utf-8')
+    assert load_query_log(str(log_path)) == ['первый', 'второй', 'третий']
+
+
+@pytest.mark.parametrize('argv', [['--concurrency', '0'], ['--requests', '0'], ['--window', '0'],
+                                  ['--rate', '-1']])
+def test_parse_args_rejects_invalid_values(argv):
+    with pytest.raises(SystemExit):
+        parse_args(argv)
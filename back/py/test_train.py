@@ -0,0 +1,101 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from train import MaterialsQAModel
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def train_in_memory(retrieval_mode: str) -> MaterialsQAModel:
+    """Модель, обученная в памяти на файлах load_all_data"""
+    model = MaterialsQAModel()
+    model.retrieval_mode = retrieval_mode
+    model.load_data_files(BASE_PATH)
+    model.vectorize_questions()
+    model.is_trained = True
+    return model
+
+
+@pytest.fixture(scope='module', params=['sparse', 'lsa'])
+def model(request):
+    return train_in_memory(request.param)
+
+
+def test_dense_index_is_contiguous_float32():
+    model = train_in_memory('lsa')
+    assert model.dense_vectors.dtype == np.float32
+    assert model.dense_vectors.flags['C_CONTIGUOUS']
+    assert model.dense_vectors.shape[0] == len(model.questions)
+
+
+def test_batch_matches_single(model):
+    questions = model.questions[::25] + ['предел текучести Ст3сп', 'сталь']
+    batch = model.find_similar_questions_batch(questions, top_k=3)
+    for question, batch_result in zip(questions, batch):
+        single = model.find_similar_questions(question, top_k=3)
+        assert [r['question'] for r in single] == [r['question'] for r in batch_result]
+        # float32 BLAS для пакета и одного вопроса округляет по-разному
+        expected = [r['similarity'] for r in batch_result]
+        assert [r['similarity'] for r in single] == pytest.approx(expected, abs=1e-5)
+
+
+def test_lsa_falls_back_to_sparse_without_components():
+    model = MaterialsQAModel()
+    model.retrieval_mode = 'lsa'
+    model.questions = ['один вопрос']
+    model.answers = {'один вопрос': 'ответ'}
+    model.data_sources = {'один вопрос': 'Table test.json'}
+    model.vectorize_questions()
+    model.is_trained = True
+
+    assert model.question_vectors is not None
+    assert model.dense_vectors is None
+    assert model.answer_threshold() == model.similarity_threshold
+    assert model.generate_answer('один вопрос') == ('ответ', pytest.approx(1.0), 'Table test.json')
+
+
+def test_load_model_rebuilds_dense_index(tmp_path):
+    sparse = train_in_memory('sparse')
+    sparse.model_path = str(tmp_path / 'model.pkl')
+    assert sparse.save_model()
+
+    model = MaterialsQAModel()
+    model.model_path = sparse.model_path
+    model.retrieval_mode = 'lsa'
+    assert model.load_model()
+    assert model.retrieval_mode == 'lsa'
+    assert model.dense_vectors is not None
+    assert model.answer_threshold() == model.lsa_threshold
+
+
+def test_load_model_without_lsa_keys(tmp_path):
+    sparse = train_in_memory('sparse')
+    # Формат pkl до появления режима LSA
+    model_data = {
+        'vectorizer': sparse.vectorizer,
+        'questions': sparse.questions,
+        'answers': sparse.answers,
+        'question_vectors': sparse.question_vectors,
+        'data_sources': sparse.data_sources,
+        'is_trained': True
+    }
+    model_path = tmp_path / 'old_model.pkl'
+    with open(model_path, 'wb') as f:
+        pickle.dump(model_data, f)
+
+    model = MaterialsQAModel()
+    model.model_path = str(model_path)
+    assert model.load_model()
+    assert model.retrieval_mode == 'sparse'
+    assert model.svd is None and model.dense_vectors is None
+    question = sparse.questions[0]
+    assert model.generate_answer(question) == sparse.generate_answer(question)
+
+
+def test_lsa_threshold_rejects_vague_questions():
+    model = train_in_memory('lsa')
+    for question in ['сталь', 'что такое ГОСТ']:
+        assert model.generate_answer(question)[0] == "Не удалось найти подходящий ответ", question